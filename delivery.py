@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Callable, Optional
+
+import pandas as pd
+
+
+def content_hash(df: pd.DataFrame, salt: str = "") -> str:
+    """
+    计算DataFrame内容的摘要（列名、列顺序和所有单元格的值），与行索引无关
+    Args:
+        salt: 附加到摘要中的字符串，用于区分不同的输出配置
+    """
+    digest = hashlib.sha256()
+    digest.update(salt.encode('utf-8'))
+    digest.update(json.dumps([str(col) for col in df.columns], ensure_ascii=False).encode('utf-8'))
+    if len(df):
+        digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def prune_cache_dir(cache_dir: str, keep: int = 30):
+    """只保留最近使用（按修改时间）的keep个缓存文件，其余删除"""
+    try:
+        names = os.listdir(cache_dir)
+    except FileNotFoundError:
+        return
+
+    paths = [os.path.join(cache_dir, name) for name in names if '.tmp' not in name]
+    paths.sort(key=os.path.getmtime, reverse=True)
+    for path in paths[keep:]:
+        try:
+            os.remove(path)
+        except OSError as e:
+            print(f"删除过期缓存 {path} 时出错: {e}")
+
+
+def render_excel_cached(df: pd.DataFrame, filename: str, digest: str,
+                        render: Callable[[pd.DataFrame, str], None],
+                        cache_dir: str = ".cache/xlsx", keep: int = 30) -> bool:
+    """
+    按内容摘要缓存生成的Excel，内容未变化时直接复制之前生成的工作簿
+    Args:
+        df: 要写入的数据
+        filename: 输出文件名
+        digest: df的内容摘要，需包含render的格式版本，否则修改render后仍会复用旧的工作簿
+        render: 生成Excel的函数，参数为 (df, 文件名)
+        keep: 缓存目录中最多保留的工作簿数量
+    Returns:
+        是否复用了缓存的工作簿
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_path = os.path.join(cache_dir, f"{digest}.xlsx")
+
+    reused = os.path.exists(cache_path)
+    if not reused:
+        # 先生成到临时文件，避免中断时留下不完整的缓存
+        tmp_path = f"{cache_path}.tmp.xlsx"
+        render(df, tmp_path)
+        os.replace(tmp_path, cache_path)
+    else:
+        # 更新修改时间，清理时按最近使用保留
+        os.utime(cache_path)
+
+    shutil.copyfile(cache_path, filename)
+    if reused:
+        print(f"内容未变化，复用已生成的Excel: {filename}")
+    prune_cache_dir(cache_dir, keep)
+    return reused
+
+
+class DeliveryLedger:
+    """记录每个投递目标上次成功投递的内容摘要，内容未变化时可跳过重复投递"""
+
+    def __init__(self, path: str = ".cache/delivery.json"):
+        self.path = path
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.records = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.records = {}
+
+    def last_delivery(self, channel: str, target: str) -> Optional[dict]:
+        """上次成功投递的记录 {"digest": 内容摘要, "delivered_at": 时间戳}"""
+        return self.records.get(channel, {}).get(target)
+
+    def is_delivered(self, channel: str, target: str, digest: str) -> bool:
+        """相同内容是否已经成功投递到该目标"""
+        record = self.last_delivery(channel, target)
+        return record is not None and record["digest"] == digest
+
+    def mark_delivered(self, channel: str, target: str, digest: str):
+        """记录一次成功投递"""
+        self.records.setdefault(channel, {})[target] = {
+            "digest": digest,
+            "delivered_at": time.time()
+        }
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.records, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
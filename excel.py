@@ -4,10 +4,141 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.application import MIMEApplication
+from email import message_from_bytes
+import hashlib
 import os
 
+import pandas as pd
+
+from delivery import prune_cache_dir
+
+# 工作簿格式版本，修改 create_styled_excel 的输出时递增，使按内容缓存的旧工作簿失效
+EXCEL_FORMAT_VERSION = "2"
+
+
+def _write_styled_sheet(writer, df, sheet_name):
+    """将DataFrame写入带有样式的sheet"""
+    # 先获取workbook对象
+    workbook = writer.book
+
+    # 定义格式
+    header_format = workbook.add_format({
+        'bold': True,
+        'text_wrap': True,
+        'valign': 'center',
+        'align': 'center',
+        'fg_color': '#D7E4BC',
+        'border': 1
+    })
+
+    cell_format = workbook.add_format({
+        'text_wrap': True,
+        'valign': 'center',
+        'align': 'center',
+        'border': 1
+    })
+
+    # 数据从第二行开始写入，第一行留给下面手动写入的标题
+    df.to_excel(writer, sheet_name=sheet_name, index=False,
+            startrow=1, header=False)  # 不写入默认header
+
+    worksheet = writer.sheets[sheet_name]
+
+    # 手动设置标题格式
+    for col_num, value in enumerate(df.columns.values):
+        worksheet.write(0, col_num, value, header_format)
+
+    # 不逐行写入数据，已通过 to_excel 写入，改为按列设置格式和列宽
+    for idx, col in enumerate(df.columns):
+        # 针对比赛日期列单独设置日期格式
+        if col == '比赛日期':
+            col_format = workbook.add_format({
+                'text_wrap': True,
+                'valign': 'center',
+                'align': 'center',
+                'border': 1,
+                'num_format': 'yyyy-mm-dd'
+            })
+        else:
+            col_format = cell_format
+
+        # 计算列宽
+        if col == '比赛日期':
+            max_len = len(str(col))
+            adjusted_width = 2 * min(max_len + 2, 20)
+        else:
+            # 空表时只按列名计算
+            data_len = df[col].astype(str).str.len().max() if len(df) else 0
+            max_len = max(data_len, len(str(col)))
+            adjusted_width = 2 * min(max_len + 2, 50)
+
+        # 按列设置宽度和格式（这样会对整列应用格式）
+        worksheet.set_column(idx, idx, adjusted_width, col_format)
+
+
+def create_styled_excel(df, filename, extra_sheets=None):
+    """
+    创建带有样式的Excel文件
+
+    extra_sheets: 附加的sheet，sheet名称 -> DataFrame，写在"数据"之后
+    """
+    with pd.ExcelWriter(filename, engine='xlsxwriter') as writer:
+        _write_styled_sheet(writer, df, '数据')
+        for sheet_name, sheet_df in (extra_sheets or {}).items():
+            _write_styled_sheet(writer, sheet_df, sheet_name)
+
+
+# 已编码的附件，按 (内容摘要, 文件名) 缓存，多个收件人共享同一份附件
+_attachment_cache = {}
+
+
+def build_excel_attachment(xlsx_file_path, content_digest=None, cache_dir=".cache/mime", keep=30):
+    """
+    构造Excel附件
+
+    指定content_digest时复用之前编码好的附件（内存及磁盘缓存），
+    相同内容的工作簿不需要重复读取和base64编码。磁盘缓存最多保留keep个最近使用的附件。
+    """
+    filename = os.path.basename(xlsx_file_path)
+    key = (content_digest, filename)
+    if content_digest is not None and key in _attachment_cache:
+        return _attachment_cache[key]
+
+    cache_path = None
+    if content_digest is not None:
+        name_digest = hashlib.sha256(f"{content_digest}|{filename}".encode('utf-8')).hexdigest()
+        cache_path = os.path.join(cache_dir, f"{name_digest}.mime")
+        if os.path.exists(cache_path):
+            with open(cache_path, 'rb') as file:
+                attachment = message_from_bytes(file.read())
+            # 更新修改时间，清理时按最近使用保留
+            os.utime(cache_path)
+            _attachment_cache[key] = attachment
+            return attachment
+
+    with open(xlsx_file_path, 'rb') as file:
+        # 读取xlsx文件内容
+        xlsx_data = file.read()
+
+    # 创建MIMEApplication对象
+    attachment = MIMEApplication(xlsx_data, _subtype='xlsx')
+    attachment.add_header('Content-Disposition', 'attachment', filename=filename)
+
+    if content_digest is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        # 先写临时文件再替换，避免中断时留下不完整的附件
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, 'wb') as file:
+            file.write(attachment.as_bytes())
+        os.replace(tmp_path, cache_path)
+        prune_cache_dir(cache_dir, keep)
+        _attachment_cache[key] = attachment
+
+    return attachment
+
+
 def send_email_with_excel(smtp_server, port, sender_email, password, 
-                         receiver_email, subject, body, xlsx_file_path):
+                         receiver_email, subject, body, xlsx_file_path, content_digest=None):
     """
     发送带Excel附件的邮件
     
@@ -20,6 +151,7 @@ def send_email_with_excel(smtp_server, port, sender_email, password,
     subject: 邮件主题
     body: 邮件正文
     excel_file_path: Excel文件路径
+    content_digest: Excel内容摘要，指定时复用已编码的附件
     """
     
     # 创建邮件对象
@@ -33,18 +165,11 @@ def send_email_with_excel(smtp_server, port, sender_email, password,
     
     # 添加xlsx附件
     try:
-        with open(xlsx_file_path, 'rb') as file:
-            # 读取xlsx文件内容
-            xlsx_data = file.read()
-            
-            # 创建MIMEApplication对象
-            attachment = MIMEApplication(xlsx_data, _subtype='xlsx')
-            attachment.add_header('Content-Disposition', 'attachment', 
-                                 filename=os.path.basename(xlsx_file_path))
-            
-            # 将附件添加到邮件中
-            msg.attach(attachment)
-            
+        attachment = build_excel_attachment(xlsx_file_path, content_digest)
+
+        # 将附件添加到邮件中
+        msg.attach(attachment)
+
         print(f"成功添加附件: {os.path.basename(xlsx_file_path)}")
         
     except FileNotFoundError:
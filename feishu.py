@@ -1,18 +1,52 @@
 import pandas as pd
 import requests
 import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import lark_oapi as lark
 from lark_oapi.api.sheets.v3 import *
 
+# 飞书表格标题中不允许出现的字符
+_INVALID_SHEET_TITLE_CHARS = '/\\?*[]:'
+
+
+class _RateBudget:
+    """全局请求速率预算（令牌桶），供并发上传的所有线程共享"""
+    def __init__(self, rate: float, burst: int = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """取得一次请求配额，配额不足时阻塞等待"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
 class DataFrameToFeishu:    
-    def __init__(self, app_id: str, app_secret: str):
+    def __init__(self, app_id: str, app_secret: str, max_requests_per_second: float = 10):
         self.app_id = app_id
         self.app_secret = app_secret
         self.access_token = self._get_access_token()
         self.client = lark.Client.builder().enable_set_token(True).log_level(lark.LogLevel.DEBUG).build()
+        # 所有写入类请求共享同一个速率预算
+        self.rate_budget = _RateBudget(max_requests_per_second)
+        # sheet信息缓存: spreadsheet_token -> {sheet标题: sheet_id}
+        self._sheet_id_cache: Dict[str, Dict[str, str]] = {}
+        self._sheet_cache_lock = threading.Lock()
     
     def _get_access_token(self) -> str:
         """获取飞书访问令牌"""
@@ -34,6 +68,16 @@ class DataFrameToFeishu:
             "Authorization": f"Bearer {self.access_token}",
             "Content-Type": "application/json"
         }
+
+    def _put(self, url: str, data: Dict[str, Any]) -> requests.Response:
+        """在速率预算内发送PUT请求"""
+        self.rate_budget.acquire()
+        return requests.put(url, headers=self._get_headers(), json=data)
+
+    def _post(self, url: str, data: Dict[str, Any]) -> requests.Response:
+        """在速率预算内发送POST请求"""
+        self.rate_budget.acquire()
+        return requests.post(url, headers=self._get_headers(), json=data)
     
     def create_new_sheet(self, title: str = "DataFrame数据"):
         """创建新的飞书表格"""
@@ -121,7 +165,7 @@ class DataFrameToFeishu:
         }
         
         try:
-            response = requests.put(url, headers=self._get_headers(), json=data)
+            response = self._put(url, data)
             response.raise_for_status()
             print(response.json())
         except Exception as e:
@@ -145,7 +189,7 @@ class DataFrameToFeishu:
         }
         
         try:
-            response = requests.put(url, headers=self._get_headers(), json=data)
+            response = self._put(url, data)
             response.raise_for_status()
             print(response.json())
         except Exception as e:
@@ -163,10 +207,7 @@ class DataFrameToFeishu:
             range: 起始单元格位置
         """
         if sheet_id is None:
-            sheets_info = self.get_sheets_info(spreadsheet_token)
-            if not sheets_info:
-                raise Exception("未找到可用的sheet")
-            sheet_id = sheets_info[0]["sheet_id"]
+            sheet_id = self.resolve_sheet_ids(spreadsheet_token, [None])[None]
         
         # 准备数据
         values = self._prepare_dataframe_data(df)
@@ -239,6 +280,158 @@ class DataFrameToFeishu:
 
         return data['sheets']
     
+    def get_sheet_ids(self, spreadsheet_token: str, refresh: bool = False) -> Dict[str, str]:
+        """
+        获取表格中 sheet标题 -> sheet_id 的映射，结果按表格缓存
+
+        Args:
+            spreadsheet_token: 表格token
+            refresh: 是否忽略缓存重新查询
+        """
+        with self._sheet_cache_lock:
+            if not refresh and spreadsheet_token in self._sheet_id_cache:
+                return self._sheet_id_cache[spreadsheet_token]
+
+        sheets_info = self.get_sheets_info(spreadsheet_token)
+        if sheets_info is None:
+            raise Exception(f"获取表格 {spreadsheet_token} 的sheet信息失败")
+
+        # 保持飞书返回的顺序，第一个即默认sheet
+        sheet_ids = {sheet["title"]: sheet["sheet_id"] for sheet in sheets_info}
+        with self._sheet_cache_lock:
+            self._sheet_id_cache[spreadsheet_token] = sheet_ids
+        return sheet_ids
+
+    def add_sheets(self, spreadsheet_token: str, titles: List[str]) -> Dict[str, str]:
+        """
+        在表格中批量新建sheet（一次请求），并写入缓存
+
+        Returns:
+            新建sheet的 标题 -> sheet_id 映射
+        """
+        url = f"https://open.feishu.cn/open-apis/sheets/v2/spreadsheets/{spreadsheet_token}/sheets_batch_update"
+
+        data = {
+            "requests": [
+                {"addSheet": {"properties": {"title": title}}} for title in titles
+            ]
+        }
+
+        response = self._post(url, data)
+        response.raise_for_status()
+        result = response.json()
+        if result.get("code", 0) != 0:
+            raise Exception(f"新建sheet失败: {result.get('msg')}")
+
+        created = {}
+        for reply in result["data"]["replies"]:
+            properties = reply["addSheet"]["properties"]
+            created[properties["title"]] = properties["sheetId"]
+
+        with self._sheet_cache_lock:
+            self._sheet_id_cache.setdefault(spreadsheet_token, {}).update(created)
+        return created
+
+    def resolve_sheet_ids(self, spreadsheet_token: str, titles: List[Optional[str]]) -> Dict[Optional[str], str]:
+        """
+        查找或新建指定标题的sheet，每个表格只查询一次sheet信息、只发起一次新建请求
+
+        Args:
+            spreadsheet_token: 表格token
+            titles: sheet标题列表，None表示表格中的第一个sheet
+        """
+        sheet_ids = self.get_sheet_ids(spreadsheet_token)
+        missing = [title for title in dict.fromkeys(titles) if title is not None and title not in sheet_ids]
+        if missing:
+            self.add_sheets(spreadsheet_token, missing)
+            sheet_ids = self.get_sheet_ids(spreadsheet_token)
+
+        resolved = {}
+        for title in titles:
+            if title is None:
+                if not sheet_ids:
+                    raise Exception("未找到可用的sheet")
+                resolved[title] = next(iter(sheet_ids.values()))
+            else:
+                resolved[title] = sheet_ids[title]
+        return resolved
+
+    @staticmethod
+    def build_fanout_targets(df: pd.DataFrame, by: str, spreadsheet_token: str = None,
+                             spreadsheet_tokens: Dict[str, str] = None,
+                             title_format: str = "{}") -> List[Dict[str, Any]]:
+        """
+        按某一列拆分DataFrame，生成 sync_dataframe_to_targets 所需的目标列表
+
+        Args:
+            df: 要拆分的DataFrame
+            by: 拆分依据的列名，例如"项目名称"、"比赛日期"、"场馆名称"
+            spreadsheet_token: 所有分组写入同一表格时使用的表格token（每组一个sheet）
+            spreadsheet_tokens: 分组值 -> 表格token，分组写入不同表格时使用，优先于spreadsheet_token
+            title_format: sheet标题格式，{}会被替换为分组值
+        """
+        targets = []
+        for key, group in df.groupby(by, sort=True):
+            key = str(key)
+            token = (spreadsheet_tokens or {}).get(key, spreadsheet_token)
+            if token is None:
+                print(f"分组 {key} 未配置目标表格，跳过")
+                continue
+
+            title = title_format.format(key)
+            for char in _INVALID_SHEET_TITLE_CHARS:
+                title = title.replace(char, "_")
+
+            targets.append({
+                "df": group.reset_index(drop=True),
+                "spreadsheet_token": token,
+                "sheet_title": title[:100]
+            })
+        return targets
+
+    def sync_dataframe_to_targets(self, targets: List[Dict[str, Any]], max_workers: int = 4) -> Dict[tuple, Any]:
+        """
+        将多个DataFrame并发同步到多个表格/sheet
+
+        Args:
+            targets: 目标列表，每项包含 df、spreadsheet_token 以及可选的 sheet_title
+                     （不存在的sheet会自动新建，None表示第一个sheet）
+            max_workers: 并发上传的线程数，所有线程共享同一个速率预算
+
+        Returns:
+            (spreadsheet_token, sheet_title) -> 写入结果，失败的目标对应异常对象
+        """
+        # 1. 每个表格只查询一次sheet信息，并一次性新建缺失的sheet
+        titles_by_token: Dict[str, List[Optional[str]]] = {}
+        for target in targets:
+            titles_by_token.setdefault(target["spreadsheet_token"], []).append(target.get("sheet_title"))
+
+        sheet_ids = {}
+        for token, titles in titles_by_token.items():
+            for title, sheet_id in self.resolve_sheet_ids(token, titles).items():
+                sheet_ids[(token, title)] = sheet_id
+
+        # 2. 并发上传
+        results = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}
+            for target in targets:
+                key = (target["spreadsheet_token"], target.get("sheet_title"))
+                future = executor.submit(self.sync_dataframe_to_existing_sheet, target["df"],
+                                         spreadsheet_token=key[0], sheet_id=sheet_ids[key])
+                futures[future] = key
+
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    results[key] = future.result()
+                    print(f"已同步 {key[1] or '默认sheet'} ({key[0]})")
+                except Exception as e:
+                    print(f"同步 {key[1] or '默认sheet'} ({key[0]}) 时出错: {e}")
+                    results[key] = e
+
+        return results
+
     def write_data_to_sheet(self, spreadsheet_token: str, sheet_id: str, 
                           values: List[List[Any]]) -> Dict[str, Any]:
         """将数据写入指定sheet"""
@@ -256,7 +449,7 @@ class DataFrameToFeishu:
             }
         }
         
-        response = requests.put(url, headers=self._get_headers(), json=data)
+        response = self._put(url, data)
         response.raise_for_status()
         return response.json()["data"]
     
@@ -283,7 +476,7 @@ class DataFrameToFeishu:
             }
             
             try:
-                requests.put(url, headers=self._get_headers(), json=data)
+                self._put(url, data)
             except Exception as e:
                 print(f"调整列宽时出错: {e}")
     
@@ -0,0 +1,354 @@
+import json
+import os
+import random
+import re
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import pandas as pd
+import requests
+
+SCHEDULE_URL = "https://infoapi.baygames.cn/api/info/scheduleUnit/Discipline"
+
+# 必要的请求头
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/142.0.0.0 Safari/537.36",
+    "Referer": "https://wrs.baygames.cn/",
+    "Origin": "https://wrs.baygames.cn"
+}
+
+
+class CircuitBreaker:
+    """
+    熔断器：连续失败达到阈值后在冷却时间内直接拒绝请求，
+    冷却结束后放行一次试探请求，成功则恢复，失败则重新熔断
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+
+    def allow(self) -> bool:
+        """是否允许发起请求"""
+        if self.opened_at is None:
+            return True
+        # 冷却结束后放行试探请求
+        return time.monotonic() - self.opened_at >= self.reset_timeout
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+# 每个主机一个熔断器
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(url: str) -> CircuitBreaker:
+    """获取URL所在主机的熔断器"""
+    host = urlparse(url).netloc
+    if host not in _breakers:
+        _breakers[host] = CircuitBreaker()
+    return _breakers[host]
+
+
+def _request_schedule(discipline: str, date: str = "", retries: int = 2,
+                      backoff: float = 0.5) -> Tuple[dict, int]:
+    """
+    请求单项赛程数据，失败时按带抖动的指数退避重试
+    Args:
+        retries: 失败后的最大重试次数
+        backoff: 退避基数（秒），第n次重试前随机等待 0 ~ backoff * 2^n 秒
+    Returns:
+        (响应JSON, 响应体字节数)，失败时返回 ({}, 0)
+    """
+    params = {
+        "Discipline": discipline,
+        "Date": date
+    }
+    breaker = get_breaker(SCHEDULE_URL)
+
+    for attempt in range(retries + 1):
+        if not breaker.allow():
+            print(f"接口已熔断，跳过请求: {discipline} {date}")
+            return {}, 0
+
+        if attempt > 0:
+            time.sleep(random.uniform(0, backoff * 2 ** attempt))
+
+        try:
+            response = requests.get(SCHEDULE_URL, params=params, headers=HEADERS, timeout=(3.05, 10))
+
+            if response.status_code == 200:
+                data = response.json()
+                breaker.record_success()
+                return data, len(response.content)
+            else:
+                print(f"请求失败，状态码: {response.status_code}")
+                # 客户端错误重试也不会成功
+                if 400 <= response.status_code < 500 and response.status_code != 429:
+                    return {}, 0
+
+        except Exception as e:
+            print(f"错误: {e}")
+
+        breaker.record_failure()
+
+    return {}, 0
+
+
+def get_schedule_simple(discipline, date="") -> dict:
+    """
+    获取单项赛程数据
+    Args:
+        discipline: 项目类型
+        date: 日期，默认为空
+    """
+    return _request_schedule(discipline, date)[0]
+
+
+def extract_units(raw_data: dict) -> List[dict]:
+    """从接口返回中取出赛程单元列表"""
+    disciplines = (raw_data.get("Result") or {}).get("Disciplines") or []
+    if not disciplines:
+        return []
+    return disciplines[0].get("Units") or []
+
+
+def _wrap_units(units: List[dict]) -> dict:
+    """将赛程单元列表包装成与接口返回相同的结构，无数据时返回空字典"""
+    if not units:
+        return {}
+    return {"Result": {"Disciplines": [{"Units": units}]}}
+
+
+# ISO 8601 格式的时间，前10个字符即为日期
+_ISO_DATE = re.compile(r"\d{4}-\d{2}-\d{2}(?:[T ]|$)")
+
+
+def _unit_date(unit: dict) -> Optional[str]:
+    """赛程单元的比赛日期，格式为'YYYY-MM-DD'"""
+    start_date = str(unit.get("StartDate") or "")
+    # 逐个单元调用 pd.to_datetime 很慢，ISO 格式直接截取日期
+    if _ISO_DATE.match(start_date):
+        return start_date[:10]
+    try:
+        return pd.to_datetime(start_date).strftime('%Y-%m-%d')
+    except (TypeError, ValueError):
+        return None
+
+
+def _sort_units(units: List[dict]) -> List[dict]:
+    """按开始时间排序，全量请求与合并缓存得到的单元顺序一致"""
+    return sorted(units, key=lambda unit: str(unit.get("StartDate") or ""))
+
+
+class ScheduleCache:
+    """赛程数据的本地文件缓存，保存各项目的全量赛程以及观测到的响应体大小"""
+
+    def __init__(self, cache_dir: str = ".cache/schedule"):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.stats_path = os.path.join(cache_dir, "stats.json")
+        self.stats = self._read_json(self.stats_path) or {}
+
+    @staticmethod
+    def _read_json(path: str) -> Optional[dict]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    @staticmethod
+    def _write_json(path: str, data: Any):
+        # 先写临时文件再替换，避免中断时留下损坏的缓存
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _full_path(self, discipline: str) -> str:
+        return os.path.join(self.cache_dir, f"{discipline}_full.json")
+
+    def load_full(self, discipline: str) -> Optional[dict]:
+        """
+        读取全量赛程缓存
+        Returns:
+            {"fetched_at": 上次全量请求时间, "updated_at": 上次成功更新时间, "units": [...]}
+        """
+        cached = self._read_json(self._full_path(discipline))
+        # fetched_at为0的缓存只由按日期请求的结果生成，并不包含全部赛程
+        if cached is None or not cached.get("fetched_at"):
+            return None
+        return cached
+
+    def save_full(self, discipline: str, units: List[dict], fetched_at: float = None):
+        """
+        保存全量赛程缓存
+        Args:
+            fetched_at: 上次全量请求的时间，默认为当前时间；只合并了部分日期时传入原值
+        """
+        now = time.time()
+        self._write_json(self._full_path(discipline), {
+            "fetched_at": fetched_at if fetched_at is not None else now,
+            "updated_at": now,
+            "units": units
+        })
+
+    def record_size(self, discipline: str, kind: str, nbytes: int):
+        """
+        记录观测到的响应体大小（指数移动平均）
+        Args:
+            kind: "full" 表示全量请求，"date" 表示按日期请求
+        """
+        if nbytes <= 0:
+            return
+        discipline_stats = self.stats.setdefault(discipline, {})
+        previous = discipline_stats.get(kind)
+        discipline_stats[kind] = nbytes if previous is None else 0.7 * previous + 0.3 * nbytes
+        self._write_json(self.stats_path, self.stats)
+
+    def observed_size(self, discipline: str, kind: str) -> Optional[float]:
+        return self.stats.get(discipline, {}).get(kind)
+
+
+class FetchPlanner:
+    """
+    赛程请求规划器
+
+    日报只需要少数几天的数据时按日期请求，并与缓存中的全量赛程合并；
+    需要全部赛程时，若全量缓存仍在有效期内，只重新请求指定的几天并返回合并后的缓存。
+    若按日期请求的总大小不小于一次全量请求，则直接全量请求并刷新缓存。
+    """
+
+    def __init__(self, cache: ScheduleCache = None, full_max_age: float = 6 * 3600):
+        """
+        Args:
+            cache: 赛程缓存，默认使用 .cache/schedule
+            full_max_age: 全量缓存的有效期（秒），过期后不再用于合并
+        """
+        self.cache = cache or ScheduleCache()
+        self.full_max_age = full_max_age
+
+    def _fetch_full(self, discipline: str) -> Optional[List[dict]]:
+        """全量请求并刷新缓存，失败时返回None"""
+        raw_data, nbytes = _request_schedule(discipline, date="")
+        if not raw_data:
+            return None
+        units = _sort_units(extract_units(raw_data))
+        self.cache.record_size(discipline, "full", nbytes)
+        self.cache.save_full(discipline, units)
+        return units
+
+    def _fetch_dates(self, discipline: str, dates: List[str]) -> Optional[List[dict]]:
+        """按日期请求，任一日期失败时返回None"""
+        units = []
+        for date in dates:
+            raw_data, nbytes = _request_schedule(discipline, date=date)
+            if not raw_data:
+                return None
+            self.cache.record_size(discipline, "date", nbytes)
+            # 只保留请求日期内的单元，接口忽略Date参数时也能得到正确结果
+            units += [unit for unit in extract_units(raw_data) if _unit_date(unit) == date]
+        return units
+
+    def _prefer_full(self, discipline: str, dates: List[str]) -> bool:
+        """根据观测到的响应体大小判断全量请求是否更划算"""
+        full_size = self.cache.observed_size(discipline, "full")
+        date_size = self.cache.observed_size(discipline, "date")
+        if full_size is None or date_size is None:
+            return False
+        return len(dates) * date_size >= full_size
+
+    def _stale(self, discipline: str, cached: Optional[dict], dates: Optional[List[str]]) -> dict:
+        """
+        请求失败时使用上次成功获取的全量缓存，并标记为过期数据；
+        没有缓存或缓存中没有所需日期的赛程时，"Missing" 为True
+        """
+        if cached is None:
+            print(f"{discipline}: 请求失败且没有缓存数据")
+            return {"Stale": True, "Missing": True}
+
+        units = cached["units"]
+        if dates is not None:
+            units = [unit for unit in units if _unit_date(unit) in dates]
+
+        updated_at = cached.get("updated_at", cached["fetched_at"])
+        updated_time = f"{datetime.fromtimestamp(updated_at):%Y-%m-%d %H:%M:%S}"
+        if not units:
+            print(f"{discipline}: 请求失败，{updated_time} 的缓存中没有所需日期的赛程")
+            return {"Stale": True, "Missing": True, "FetchedAt": updated_at}
+
+        print(f"{discipline}: 请求失败，使用 {updated_time} 的缓存数据")
+        raw_data = _wrap_units(units)
+        raw_data["Stale"] = True
+        raw_data["FetchedAt"] = updated_at
+        return raw_data
+
+    def _merge(self, discipline: str, cached: dict, dates: List[str], date_units: List[dict]) -> List[dict]:
+        """用最新的按日期数据替换缓存中对应日期的单元，并写回缓存（保留上次全量请求时间）"""
+        units = _sort_units([unit for unit in cached["units"] if _unit_date(unit) not in dates] + date_units)
+        self.cache.save_full(discipline, units, fetched_at=cached["fetched_at"])
+        return units
+
+    def fetch(self, discipline: str, dates: List[str] = None, refresh_dates: List[str] = None) -> dict:
+        """
+        获取单项赛程数据
+        Args:
+            discipline: 项目类型
+            dates: 需要的日期列表（'YYYY-MM-DD'），为None时获取全部赛程
+            refresh_dates: 仅在dates为None时使用。全量缓存在有效期内时只按日期重新请求这些日期
+                           （例如今天和明天这些赛程状态会变化的日期），与缓存合并后返回全部赛程；
+                           其他日期的赛程最多落后 full_max_age
+        Returns:
+            与接口返回结构相同的数据；dates不为None时只包含这些日期的单元。
+            请求失败而使用缓存数据时，返回值中 "Stale" 为True，"FetchedAt" 为缓存更新时间；
+            缓存中也没有所需数据时 "Missing" 为True
+        """
+        cached = self.cache.load_full(discipline)
+        cache_fresh = cached is not None and time.time() - cached["fetched_at"] <= self.full_max_age
+
+        if dates is None:
+            refresh_dates = list(dict.fromkeys(refresh_dates or []))
+            if cache_fresh and refresh_dates and not self._prefer_full(discipline, refresh_dates):
+                date_units = self._fetch_dates(discipline, refresh_dates)
+                if date_units is None:
+                    return self._stale(discipline, cached, None)
+                return _wrap_units(self._merge(discipline, cached, refresh_dates, date_units))
+
+            units = self._fetch_full(discipline)
+            if units is None:
+                return self._stale(discipline, cached, None)
+            return _wrap_units(units)
+
+        dates = list(dict.fromkeys(dates))
+
+        if not cache_fresh and self._prefer_full(discipline, dates):
+            print(f"{discipline}: 按日期请求不比全量请求更小，改为全量请求")
+            units = self._fetch_full(discipline)
+        else:
+            date_units = self._fetch_dates(discipline, dates)
+            if date_units is None:
+                # 按日期请求失败时：有效期内的缓存直接作为过期数据返回，否则再尝试全量请求
+                units = None if cache_fresh else self._fetch_full(discipline)
+            elif cached is not None:
+                # 合并写回缓存，之后获取全部赛程时可直接使用
+                units = self._merge(discipline, cached, dates, date_units)
+            else:
+                # 没有全量缓存时不写缓存，避免缓存中只有部分日期
+                units = date_units
+
+        if units is None:
+            return self._stale(discipline, cached, dates)
+
+        return _wrap_units([unit for unit in units if _unit_date(unit) in dates])
@@ -1,15 +1,29 @@
 import argparse
 from zoneinfo import ZoneInfo
-import requests
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
+from functools import partial
 
 from feishu import DataFrameToFeishu
 
-from excel import send_email_with_excel
+from fetcher import FetchPlanner, ScheduleCache, extract_units
+
+from excel import EXCEL_FORMAT_VERSION, create_styled_excel, send_email_with_excel
+
+from delivery import DeliveryLedger, content_hash, render_excel_cached
+
+from processing import SCHEDULE_COLUMNS, ShardedExecutor, partition_units
+
+from profiling import PROFILE_MODES, Profiler
+
+from summary import ScheduleSummary
+
+def main(app_id, app_secret, find_data, to_feishu=False, feishu_split_by=None, force=False, workers=1,
+         profiler=None):
+    # 未指定时使用不做任何分析的Profiler
+    profiler = profiler or Profiler()
 
-def main(app_id, app_secret, find_data, to_feishu=False):
     displine_code = {
         "游泳": "SWM",
         "射箭": "ARC",
@@ -24,195 +38,44 @@ def main(app_id, app_secret, find_data, to_feishu=False):
         "排球": "VVO"
     }
 
-    def get_schedule_simple(discipline, date="") -> dict:
-        """
-        获取单项赛程数据
-        Args:
-            discipline: 项目类型
-            date: 日期，默认为空
-        """
-        url = "https://infoapi.baygames.cn/api/info/scheduleUnit/Discipline"
-        
-        params = {
-            "Discipline": discipline,
-            "Date": date
-        }
-        
-        # 必要的请求头
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/142.0.0.0 Safari/537.36",
-            "Referer": "https://wrs.baygames.cn/",
-            "Origin": "https://wrs.baygames.cn"
-        }
-        
-        try:
-            response = requests.get(url, params=params, headers=headers, timeout=10)
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                print(f"请求失败，状态码: {response.status_code}")
-                return {}
-                
-        except Exception as e:
-            print(f"错误: {e}")
-            return {}
-        
-    df_total = pd.DataFrame()
-
-    for name, code in displine_code.items():
-        raw_data = get_schedule_simple(discipline=code, date="")
-        if raw_data:
-            # 将数据转换为DataFrame
-            print("处理项目:", name)
-
-
-            data = raw_data["Result"]["Disciplines"][0]["Units"]
-
-            # 创建DataFrame
-            df = pd.DataFrame(data)
-
-            # 提取深圳的比赛数据
-            df = df[df['CHI_VenueName'].str.contains('深圳', na=False)]
-
-            # 展开Attach列中的嵌套数据
-            def extract_attach_info(row):
-                attach = row['Attach']
-                if attach and 'Details' in attach and attach['Details'] and 'HeadToHead' in attach['Details']:
-                    head_to_head = attach['Details']['HeadToHead']
-                    if head_to_head and len(head_to_head) >= 2:
-                        # 提取第一位参与者信息
-                        row['Participant1_Code'] = head_to_head[0].get('ParticipantCode')
-                        row['Participant1_Name'] = head_to_head[0].get('ParticipantName')
-                        row['Participant1_Organisation'] = head_to_head[0].get('Organisation')
-                        row['Participant1_Result'] = head_to_head[0].get('Result')
-                        row['Participant1_Wlt'] = head_to_head[0].get('Wlt')
-                        
-                        # 提取第二位参与者信息
-                        row['Participant2_Code'] = head_to_head[1].get('ParticipantCode')
-                        row['Participant2_Name'] = head_to_head[1].get('ParticipantName')
-                        row['Participant2_Organisation'] = head_to_head[1].get('Organisation')
-                        row['Participant2_Result'] = head_to_head[1].get('Result')
-                        row['Participant2_Wlt'] = head_to_head[1].get('Wlt')
-
-                        # 整理对阵双方
-                        if row['Participant1_Name'] is not None and row['Participant2_Name'] is not None:
-                            row['Matchup'] = f"{row['Participant1_Name']} vs {row['Participant2_Name']}"
-                        if row['Participant1_Result'] is not None and row['Participant2_Result'] is not None:
-                            row['Matchup_Result'] = f"{row['Participant1_Result']} : {row['Participant2_Result']}"
-
-                        # 删除临时列
-                        del row['Participant1_Code']
-                        del row['Participant2_Code']
-                        del row['Participant1_Name']
-                        del row['Participant2_Name']
-                        del row['Participant1_Organisation']
-                        del row['Participant2_Organisation']
-                        del row['Participant1_Result']
-                        del row['Participant2_Result']
-                        del row['Participant1_Wlt']
-                        del row['Participant2_Wlt']
-                
-                return row
-            
-            # 将StartDate和EndDate转换拆分为日期和时间
-            df['StartTime'] = pd.to_datetime(df['StartDate']).dt.time
-            df['EndTime'] = pd.to_datetime(df['EndDate']).dt.time
-
-            df['Date'] = pd.to_datetime(df['StartDate']).dt.date
-
-
-            # 应用函数展开嵌套数据
-            df = df.apply(extract_attach_info, axis=1)
-
-            # 删除原始的Attach列（可选）
-            df = df.drop('Attach', axis=1)
-
-            # 显示前几行数据
-            print("数据表格的前5行:")
-            print(df.head())
-
-            # 显示数据框的基本信息
-            print("\n数据框形状:", df.shape)
-            print("\n列名:")
-            print(df.columns.tolist())
-
-
-            # 判断场馆名称和比赛地点是否重复
-            if df['CHI_VenueName'].equals(df['CHI_LocationName']):
-                print("\n场馆名称和比赛地点列内容相同，删除列")
-                df = df.drop('CHI_LocationName', axis=1)
-
-            # 将项目名称、比赛日期、开始时间、结束时间列移动到前面
-            cols = df.columns.tolist()
-            cols = [col for col in cols if col not in ['CHI_DisciplineName', 'ENG_DisciplineName', 'Date', 'StartTime', 'EndTime']]
-            cols = ['CHI_DisciplineName', 'ENG_DisciplineName', 'Date', 'StartTime', 'EndTime'] + cols
-            df = df[cols]
-
-            # 分简体中文和繁体中文保存
-            CHN_columns = [col for col in df.columns if col.startswith('CHI_') or col in [
-                'Date', 'StartTime', 'EndTime', 'Medal',
-                'Matchup', 'Matchup_Organisation', 'Matchup_Result'
-                # 'Participant1_Name', 'Participant1_Organisation', 
-                # 'Participant1_Result', 'Participant1_Wlt',
-                # 'Participant2_Name', 'Participant2_Organisation', 
-                # 'Participant2_Result', 'Participant2_Wlt'
-            ]]
-
-            ENG_columns = [col for col in df.columns if col.startswith('ENG_') or col in [
-                'StartDate', 'EndDate', 'Medal',
-                'Matchup', 'Matchup_Organisation', 'Matchup_Result'
-                # 'Participant1_Name', 'Participant1_Organisation', 
-                # 'Participant1_Result', 'Participant1_Wlt',
-                # 'Participant2_Name', 'Participant2_Organisation', 
-                # 'Participant2_Result', 'Participant2_Wlt'
-            ]]
-
-            df_chn = df[CHN_columns]
-            df_eng = df[ENG_columns]
-
-            # 将标题行中的列名变为中文
-            column_rename_chn = {
-                'CHI_LocationName': '比赛地点',
-                'CHI_VenueName': '场馆名称',
-                'CHI_EventName': '赛事名称',
-                'CHI_ItemName': '比赛名称',
-                'CHI_DisciplineName': '项目名称',
-                'CHI_ScheduleUnitName': '赛程单元名称',
-                'CHI_ScheduleStatusName': '当前赛程状态',
-                'Date': '比赛日期',
-                'StartTime': '开始时间',
-                'EndTime': '结束时间',
-                'Medal': '产生奖牌数',
-                'Matchup': '对阵双方',
-                'Matchup_Organisation': '对阵双方组织',
-                'Matchup_Result': '对阵双方结果',
-                # 'Participant1_Name': '参与者1姓名',
-                # 'Participant1_Organisation': '参与者1组织',
-                # 'Participant1_Result': '参与者1结果',
-                # 'Participant1_Wlt': '参与者1胜负情况',
-                # 'Participant2_Name': '参与者2姓名',
-                # 'Participant2_Organisation': '参与者2组织',
-                # 'Participant2_Result': '参与者2结果',
-                # 'Participant2_Wlt': '参与者2胜负情况'
-            }
-            
-            # 重命名列
-            df_chn = df_chn.rename(columns=column_rename_chn)
-
-            df_total = pd.concat([df_total, df_chn], ignore_index=True)
-
-            # # 保存为Excel文件（可选）
-            # df.to_excel(f'{name}_schedule.xlsx', index=False, engine='openpyxl')
-
-
-
-            # 保存为CSV文件（可选）
-            # df.to_csv(f'{name}_schedule.csv', index=False, encoding='utf-8-sig')
-            # df_chn.to_csv(f'{name}_赛程.csv', index=False, encoding='utf-8-sig')
-            # df_eng.to_csv(f'繁体_{name}_赛程.csv', index=False, encoding='utf-8-sig')
-
-            print(f"\n数据已保存为Excel和CSV文件，共{len(df)}条记录")
+    # 日报只需要查找日期的数据；同步飞书时需要全部赛程，
+    # 全量缓存有效时只重新请求今天和查找日期，其余日期使用缓存
+    planner = FetchPlanner(ScheduleCache())
+    fetch_dates = None if to_feishu else [find_data]
+    today = (pd.to_datetime(find_data) - pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+    refresh_dates = [today, find_data]
+
+    # 赛区关键字，按场馆名称筛选
+    regions = ["深圳"]
+
+    # 每个分片为 (项目名称, 赛程单元, 赛区)
+    shards = []
+    # 请求失败、使用了缓存数据或没有可用数据的项目
+    stale_disciplines = []
+
+    with profiler.stage("fetch"):
+        for name, code in displine_code.items():
+            raw_data = planner.fetch(code, dates=fetch_dates, refresh_dates=refresh_dates)
+            if raw_data.get("Missing"):
+                stale_disciplines.append(f"{name}（无可用数据）")
+            elif raw_data.get("Stale"):
+                stale_disciplines.append(name)
+            # 在主进程中按赛区拆分，每个分片只携带本赛区的单元
+            for region, region_units in partition_units(extract_units(raw_data), regions).items():
+                shards.append((name, region_units, region))
+
+    # 按项目×赛区分片处理，多进程时各分片并行
+    with profiler.stage("transform"):
+        frames = ShardedExecutor(workers).run(shards)
+        # 没有任何赛程时（例如按日期请求的当天深圳没有比赛）仍保留列，输出空的日报
+        df_total = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=SCHEDULE_COLUMNS)
+
+    # 按日期×场馆汇总，只重新计算赛程单元有变化的分组
+    with profiler.stage("summary"):
+        summary = ScheduleSummary.load()
+        changed = summary.update(df_total, dates=fetch_dates)
+        summary.save()
+        print(f"场馆汇总已更新，{len(changed)}个分组有变化")
 
     # df_total.to_csv('1.所有项目_赛程.csv', index=False, encoding='utf-8-sig')
     # df_total.to_excel('1.所有项目_赛程.xlsx', index=False, engine='openpyxl')
@@ -252,121 +115,14 @@ def main(app_id, app_secret, find_data, to_feishu=False):
     df_found['比赛日期'] = df_found['比赛日期'].astype(str)
 
 
-    def create_styled_excel(df, filename):
-        """创建带有样式的Excel文件"""
-        with pd.ExcelWriter(filename, engine='xlsxwriter') as writer:
-            # 先获取workbook对象
-            workbook = writer.book
-            
-            # 定义格式
-            header_format = workbook.add_format({
-                'bold': True,
-                'text_wrap': True,
-                'valign': 'center',
-                'align': 'center',
-                'fg_color': '#D7E4BC',
-                'border': 1
-            })
-            
-            cell_format = workbook.add_format({
-                'text_wrap': True,
-                'valign': 'center',
-                'align': 'center',
-                'border': 1
-            })
-            
-            # 在to_excel时直接应用格式
-            df.to_excel(writer, sheet_name='数据', index=False, 
-                    startrow=0, header=False)  # 不写入默认header
-            
-            worksheet = writer.sheets['数据']
-            
-            # 手动设置标题格式
-            for col_num, value in enumerate(df.columns.values):
-                worksheet.write(0, col_num, value, header_format)
-            
-            # 不逐行写入数据，已通过 to_excel 写入，改为按列设置格式和列宽
-            for idx, col in enumerate(df.columns):
-                # 针对比赛日期列单独设置日期格式
-                if col == '比赛日期':
-                    col_format = workbook.add_format({
-                        'text_wrap': True,
-                        'valign': 'center',
-                        'align': 'center',
-                        'border': 1,
-                        'num_format': 'yyyy-mm-dd'
-                    })
-                else:
-                    col_format = cell_format
-
-                # 计算列宽
-                if col == '比赛日期':
-                    max_len = len(str(col))
-                    adjusted_width = 2 * min(max_len + 2, 20)
-                else:
-                    max_len = max(df[col].astype(str).str.len().max(), len(str(col)))
-                    adjusted_width = 2 * min(max_len + 2, 50)
-
-                # 按列设置宽度和格式（这样会对整列应用格式）
-                worksheet.set_column(idx, idx, adjusted_width, col_format)
-
-
-    # def create_styled_excel(df, filename):
-    #     """创建带有样式的Excel文件，保留日期时间格式"""
-    #     with pd.ExcelWriter(filename, engine='xlsxwriter') as writer:
-    #         # 先正常写入数据，保留所有格式
-    #         df.to_excel(writer, sheet_name='数据', index=False)
-            
-    #         workbook = writer.book
-    #         worksheet = writer.sheets['数据']
-            
-    #         # 定义格式
-    #         header_format = workbook.add_format({
-    #             'bold': True,
-    #             'text_wrap': True,
-    #             'valign': 'center',
-    #             'align': 'center',
-    #             'fg_color': '#D7E4BC',
-    #             'border': 1
-    #         })
-            
-    #         cell_format = workbook.add_format({
-    #             'text_wrap': True,
-    #             'valign': 'center',
-    #             'align': 'center',
-    #             'border': 1
-    #         })
-            
-    #         # 设置标题格式
-    #         for col_num, value in enumerate(df.columns.values):
-    #             worksheet.write(0, col_num, value, header_format)
-            
-    #         # 调整列宽并设置数据格式，但保留原有数字格式
-    #         for idx, col in enumerate(df.columns):
-    #             # 调整列宽
-    #             if col == '比赛日期':
-    #                 # 对于日期列，创建一个新的格式，保留日期显示但添加边框居中
-    #                 col_format = workbook.add_format({
-    #                     'text_wrap': True,
-    #                     'valign': 'center', 
-    #                     'align': 'center',
-    #                     'border': 1,
-    #                     'num_format': 'yyyy-mm-dd'  # 保留日期格式
-    #                 })
-    #                 max_len = len(str(col))
-    #                 adjusted_width = 2 * min(max_len + 2, 20)
-    #                 worksheet.set_column(idx, idx, adjusted_width, col_format)
-    #             else:
-    #                 col_format = cell_format
-    #                 max_len = max(
-    #                     df[col].astype(str).str.len().max(),
-    #                     len(str(col))
-    #                 )
-    #                 adjusted_width = 2 * min(max_len + 2, 50)
-    #                 worksheet.set_column(idx, idx, adjusted_width, col_format)
-
     # df_found.to_excel(f'深圳赛区赛程_{find_data}.xlsx', index=False, engine='openpyxl')
-    create_styled_excel(df_found, f'深圳赛区赛程_{find_data}.xlsx')
+    # 当天数据未变化时复用之前生成的Excel
+    with profiler.stage("excel"):
+        day_summary = summary.to_frame(find_data)
+        # 摘要中包含工作簿格式版本，格式变化后不会复用旧的工作簿
+        day_digest = content_hash(df_found, salt=f"{EXCEL_FORMAT_VERSION}|{content_hash(day_summary)}")
+        render_excel_cached(df_found, f'深圳赛区赛程_{find_data}.xlsx', day_digest,
+                            partial(create_styled_excel, extra_sheets={'场馆汇总': day_summary}))
 
 
 
@@ -374,15 +130,44 @@ def main(app_id, app_secret, find_data, to_feishu=False):
 
     # 导入飞书
     if to_feishu:
-        # df_total左侧加入序号列
-        df_total.insert(0, '序号', range(1, len(df_total) + 1))
+        with profiler.stage("feishu"):
+            spreadsheet_token = "ZN8Rsb3KyhzwGmtJY9jcZDZ4nHc"
+            ledger = DeliveryLedger()
+            feishu_digest = content_hash(df_total, salt=feishu_split_by or "")
 
-        feishu_app_id = app_id
-        feishu_app_secret = app_secret
-        feishu_sync = DataFrameToFeishu(feishu_app_id, feishu_app_secret)
-        # sheet_info = feishu_sync.sync_dataframe_to_new_sheet(df_total, title=f"深圳赛程数据汇总")
-        sheet_info = feishu_sync.sync_dataframe_to_existing_sheet(df_total, spreadsheet_token="ZN8Rsb3KyhzwGmtJY9jcZDZ4nHc")
-        print("飞书表格创建成功，表格信息：", sheet_info)
+            if not force and ledger.is_delivered("feishu", spreadsheet_token, feishu_digest):
+                print("赛程数据与上次同步飞书时相同，跳过飞书同步")
+            else:
+                feishu_app_id = app_id
+                feishu_app_secret = app_secret
+                feishu_sync = DataFrameToFeishu(feishu_app_id, feishu_app_secret)
+
+                # 汇总数据写入第一个sheet
+                targets = [{"df": df_total, "spreadsheet_token": spreadsheet_token, "sheet_title": None}]
+                # 各日期各场馆的汇总
+                targets.append({"df": summary.to_frame(), "spreadsheet_token": spreadsheet_token,
+                                "sheet_title": "场馆汇总"})
+                # 按项目/日期/场馆拆分，每组写入同一表格中的独立sheet
+                if feishu_split_by:
+                    targets += feishu_sync.build_fanout_targets(df_total, by=feishu_split_by,
+                                                                spreadsheet_token=spreadsheet_token)
+
+                # 每个sheet左侧加入序号列
+                for target in targets:
+                    target["df"] = target["df"].copy()
+                    target["df"].insert(0, '序号', range(1, len(target["df"]) + 1))
+
+                # sheet_info = feishu_sync.sync_dataframe_to_new_sheet(df_total, title=f"深圳赛程数据汇总")
+                sheet_info = feishu_sync.sync_dataframe_to_targets(targets)
+                print("飞书表格创建成功，表格信息：", sheet_info)
+
+                # 所有目标都同步成功才记录，失败时下次运行会重新同步
+                if not any(isinstance(result, Exception) for result in sheet_info.values()):
+                    ledger.mark_delivered("feishu", spreadsheet_token, feishu_digest)
+
+    if stale_disciplines:
+        print(f"\n注意：以下项目请求失败，使用了缓存数据：{'、'.join(stale_disciplines)}")
+    return stale_disciplines, day_digest, summary
 
 if __name__ == "__main__":
     # 由cli输入app_id和app_secret
@@ -390,16 +175,28 @@ if __name__ == "__main__":
     parser.add_argument("--to_feishu", action='store_true', help="Upload data to Feishu")
     parser.add_argument("--app_id", type=str, required=False, help="Feishu App ID")
     parser.add_argument("--app_secret", type=str, required=False, help="Feishu App Secret")
+    parser.add_argument("--feishu_split_by", type=str, required=False, choices=["项目名称", "比赛日期", "场馆名称"],
+                        help="Additionally write one Feishu sheet per discipline/day/venue")
     parser.add_argument("--to_email", action='store_true', help="Send Email with Excel Attachment")
     parser.add_argument("--sender_email", type=str, required=False, help="Sender Email Address")
     parser.add_argument("--password", type=str, required=False, help="Sender Email Password")
     parser.add_argument("--receiver_email", type=str, required=False, help="Receiver Email Address")
+    parser.add_argument("--workers", type=int, default=1, help="Number of processes used to transform schedule data")
+    parser.add_argument("--profile", type=str, required=False, choices=PROFILE_MODES,
+                        help="Profile each pipeline stage with cProfile or a sampling profiler")
+    parser.add_argument("--profile_memory", action='store_true', help="Track allocations of each stage with tracemalloc")
+    parser.add_argument("--profile_dir", type=str, default="profile", help="Directory for profiling reports")
+    parser.add_argument("--force", action='store_true', help="Deliver even if the data is unchanged since the last delivery")
     args = parser.parse_args()
 
 
+    profiler = Profiler(args.profile, track_memory=args.profile_memory, output_dir=args.profile_dir)
+
     # 获取t+1的日期
     find_data = (datetime.now(ZoneInfo('Asia/Shanghai')) + timedelta(days=1)).strftime('%Y-%m-%d')
-    main(args.app_id, args.app_secret, find_data, to_feishu=args.to_feishu)
+    stale_disciplines, day_digest, _ = main(args.app_id, args.app_secret, find_data, to_feishu=args.to_feishu,
+                                            feishu_split_by=args.feishu_split_by, force=args.force,
+                                            workers=args.workers, profiler=profiler)
     
     if args.to_email and args.receiver_email:
         sender_email = args.sender_email
@@ -410,8 +207,20 @@ if __name__ == "__main__":
         port = 587
         subject = f"深圳赛区赛程数据汇总 - {find_data}"
         body = "请查收附件中的深圳赛区赛程数据汇总。"
+        if stale_disciplines:
+            body += f"\n\n注意：以下项目的最新数据获取失败，使用了上次成功获取的数据：{'、'.join(stale_disciplines)}"
         excel_file_path = f"./深圳赛区赛程_{find_data}.xlsx"
-        # 发送邮件
-        for receiver_email in receiver_emails.split(','):
-            send_email_with_excel(smtp_server, port, sender_email, password,
-                                  receiver_email, subject, body, excel_file_path)
+        with profiler.stage("email"):
+            ledger = DeliveryLedger()
+            # 发送邮件（同一收件人同一天的相同内容只发送一次，附件编码在收件人之间复用）
+            for receiver_email in receiver_emails.split(','):
+                email_target = f"{receiver_email}|{find_data}"
+                if not args.force and ledger.is_delivered("email", email_target, day_digest):
+                    print(f"{receiver_email} 已收到相同内容的赛程，跳过发送")
+                    continue
+                if send_email_with_excel(smtp_server, port, sender_email, password,
+                                         receiver_email, subject, body, excel_file_path,
+                                         content_digest=day_digest):
+                    ledger.mark_delivered("email", email_target, day_digest)
+
+    profiler.write_summary()
@@ -0,0 +1,274 @@
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# 没有任何赛程时结果表的列，与 transform_units 输出的前几列一致
+SCHEDULE_COLUMNS = ['项目名称', '比赛日期', '开始时间', '结束时间', '场馆名称', '赛事名称',
+                    '比赛名称', '赛程单元名称', '当前赛程状态', '产生奖牌数']
+
+
+def transform_units(name: str, units: List[dict], region: str = "深圳") -> Optional[pd.DataFrame]:
+    """
+    将单个项目的赛程单元整理为中文列名的赛程表
+    Args:
+        name: 项目名称（仅用于输出日志）
+        units: 接口返回的赛程单元列表
+        region: 赛区关键字，按场馆名称筛选
+    Returns:
+        整理后的赛程DataFrame，该赛区没有赛程时返回None
+    """
+    # 将数据转换为DataFrame
+    print("处理项目:", name, region)
+
+    # 创建DataFrame
+    df = pd.DataFrame(units)
+
+    # 提取该赛区的比赛数据
+    df = df[df['CHI_VenueName'].str.contains(region, na=False)]
+    if df.empty:
+        print(f"{name} 在{region}没有赛程，跳过")
+        return None
+
+    # 展开Attach列中的嵌套数据
+    def extract_attach_info(row):
+        attach = row['Attach']
+        if attach and 'Details' in attach and attach['Details'] and 'HeadToHead' in attach['Details']:
+            head_to_head = attach['Details']['HeadToHead']
+            if head_to_head and len(head_to_head) >= 2:
+                # 提取第一位参与者信息
+                row['Participant1_Code'] = head_to_head[0].get('ParticipantCode')
+                row['Participant1_Name'] = head_to_head[0].get('ParticipantName')
+                row['Participant1_Organisation'] = head_to_head[0].get('Organisation')
+                row['Participant1_Result'] = head_to_head[0].get('Result')
+                row['Participant1_Wlt'] = head_to_head[0].get('Wlt')
+
+                # 提取第二位参与者信息
+                row['Participant2_Code'] = head_to_head[1].get('ParticipantCode')
+                row['Participant2_Name'] = head_to_head[1].get('ParticipantName')
+                row['Participant2_Organisation'] = head_to_head[1].get('Organisation')
+                row['Participant2_Result'] = head_to_head[1].get('Result')
+                row['Participant2_Wlt'] = head_to_head[1].get('Wlt')
+
+                # 整理对阵双方
+                if row['Participant1_Name'] is not None and row['Participant2_Name'] is not None:
+                    row['Matchup'] = f"{row['Participant1_Name']} vs {row['Participant2_Name']}"
+                if row['Participant1_Result'] is not None and row['Participant2_Result'] is not None:
+                    row['Matchup_Result'] = f"{row['Participant1_Result']} : {row['Participant2_Result']}"
+
+                # 删除临时列
+                del row['Participant1_Code']
+                del row['Participant2_Code']
+                del row['Participant1_Name']
+                del row['Participant2_Name']
+                del row['Participant1_Organisation']
+                del row['Participant2_Organisation']
+                del row['Participant1_Result']
+                del row['Participant2_Result']
+                del row['Participant1_Wlt']
+                del row['Participant2_Wlt']
+
+        return row
+
+    # 将StartDate和EndDate转换拆分为日期和时间
+    df['StartTime'] = pd.to_datetime(df['StartDate']).dt.time
+    df['EndTime'] = pd.to_datetime(df['EndDate']).dt.time
+
+    df['Date'] = pd.to_datetime(df['StartDate']).dt.date
+
+
+    # 应用函数展开嵌套数据
+    df = df.apply(extract_attach_info, axis=1)
+
+    # 删除原始的Attach列（可选）
+    df = df.drop('Attach', axis=1)
+
+    # 显示前几行数据
+    print("数据表格的前5行:")
+    print(df.head())
+
+    # 显示数据框的基本信息
+    print("\n数据框形状:", df.shape)
+    print("\n列名:")
+    print(df.columns.tolist())
+
+
+    # 判断场馆名称和比赛地点是否重复
+    if df['CHI_VenueName'].equals(df['CHI_LocationName']):
+        print("\n场馆名称和比赛地点列内容相同，删除列")
+        df = df.drop('CHI_LocationName', axis=1)
+
+    # 将项目名称、比赛日期、开始时间、结束时间列移动到前面
+    cols = df.columns.tolist()
+    cols = [col for col in cols if col not in ['CHI_DisciplineName', 'ENG_DisciplineName', 'Date', 'StartTime', 'EndTime']]
+    cols = ['CHI_DisciplineName', 'ENG_DisciplineName', 'Date', 'StartTime', 'EndTime'] + cols
+    df = df[cols]
+
+    # 分简体中文和繁体中文保存
+    CHN_columns = [col for col in df.columns if col.startswith('CHI_') or col in [
+        'Date', 'StartTime', 'EndTime', 'Medal',
+        'Matchup', 'Matchup_Organisation', 'Matchup_Result'
+        # 'Participant1_Name', 'Participant1_Organisation', 
+        # 'Participant1_Result', 'Participant1_Wlt',
+        # 'Participant2_Name', 'Participant2_Organisation', 
+        # 'Participant2_Result', 'Participant2_Wlt'
+    ]]
+
+    ENG_columns = [col for col in df.columns if col.startswith('ENG_') or col in [
+        'StartDate', 'EndDate', 'Medal',
+        'Matchup', 'Matchup_Organisation', 'Matchup_Result'
+        # 'Participant1_Name', 'Participant1_Organisation', 
+        # 'Participant1_Result', 'Participant1_Wlt',
+        # 'Participant2_Name', 'Participant2_Organisation', 
+        # 'Participant2_Result', 'Participant2_Wlt'
+    ]]
+
+    df_chn = df[CHN_columns]
+    df_eng = df[ENG_columns]
+
+    # 将标题行中的列名变为中文
+    column_rename_chn = {
+        'CHI_LocationName': '比赛地点',
+        'CHI_VenueName': '场馆名称',
+        'CHI_EventName': '赛事名称',
+        'CHI_ItemName': '比赛名称',
+        'CHI_DisciplineName': '项目名称',
+        'CHI_ScheduleUnitName': '赛程单元名称',
+        'CHI_ScheduleStatusName': '当前赛程状态',
+        'Date': '比赛日期',
+        'StartTime': '开始时间',
+        'EndTime': '结束时间',
+        'Medal': '产生奖牌数',
+        'Matchup': '对阵双方',
+        'Matchup_Organisation': '对阵双方组织',
+        'Matchup_Result': '对阵双方结果',
+        # 'Participant1_Name': '参与者1姓名',
+        # 'Participant1_Organisation': '参与者1组织',
+        # 'Participant1_Result': '参与者1结果',
+        # 'Participant1_Wlt': '参与者1胜负情况',
+        # 'Participant2_Name': '参与者2姓名',
+        # 'Participant2_Organisation': '参与者2组织',
+        # 'Participant2_Result': '参与者2结果',
+        # 'Participant2_Wlt': '参与者2胜负情况'
+    }
+
+    # 重命名列
+    df_chn = df_chn.rename(columns=column_rename_chn)
+
+
+    # # 保存为Excel文件（可选）
+    # df.to_excel(f'{name}_schedule.xlsx', index=False, engine='openpyxl')
+
+
+
+    # 保存为CSV文件（可选）
+    # df.to_csv(f'{name}_schedule.csv', index=False, encoding='utf-8-sig')
+    # df_chn.to_csv(f'{name}_赛程.csv', index=False, encoding='utf-8-sig')
+    # df_eng.to_csv(f'繁体_{name}_赛程.csv', index=False, encoding='utf-8-sig')
+
+    print(f"\n数据已保存为Excel和CSV文件，共{len(df)}条记录")
+
+    return df_chn
+
+
+# 除 CHI_ 开头的字段外，transform_units 用到的字段；其余字段不会出现在结果中
+_SHARD_FIELDS = {'ENG_DisciplineName', 'StartDate', 'EndDate', 'Medal', 'Attach'}
+
+
+def _compact_unit(unit: dict) -> dict:
+    """只保留整理赛程需要的字段，Attach中只保留对阵双方的名称和结果，没有对阵信息时不传Attach"""
+    compact = {key: value for key, value in unit.items() if key.startswith('CHI_') or key in _SHARD_FIELDS}
+    attach = unit.get('Attach')
+    if attach and 'Details' in attach and attach['Details'] and 'HeadToHead' in attach['Details']:
+        head_to_head = attach['Details']['HeadToHead'] or []
+        compact['Attach'] = {'Details': {'HeadToHead': [
+            {'ParticipantName': participant.get('ParticipantName'), 'Result': participant.get('Result')}
+            for participant in head_to_head
+        ]}}
+    else:
+        # transform_units 只读取HeadToHead，出场名单、成绩等其他内容不需要传给子进程
+        compact['Attach'] = None
+    return compact
+
+
+def partition_units(units: List[dict], regions: List[str]) -> Dict[str, List[dict]]:
+    """
+    在主进程中按赛区拆分赛程单元，每个分片只携带本赛区、精简后的单元，
+    减少传给子进程的数据量
+    Returns:
+        赛区 -> 该赛区的赛程单元（没有赛程的赛区不出现）
+    """
+    partitions: Dict[str, List[dict]] = {}
+    for unit in units:
+        venue = unit.get('CHI_VenueName') or ''
+        matched = [region for region in regions if region in venue]
+        if not matched:
+            continue
+        compact = _compact_unit(unit)
+        for region in matched:
+            partitions.setdefault(region, []).append(compact)
+    return {region: partitions[region] for region in regions if region in partitions}
+
+
+def _encode_frame(df: Optional[pd.DataFrame]) -> Optional[Tuple[str, bytes]]:
+    """将结果编码为Arrow IPC列式数据，无法转换时退回pickle"""
+    if df is None:
+        return None
+    if pa is not None:
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            sink = pa.BufferOutputStream()
+            with pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+            return "arrow", sink.getvalue().to_pybytes()
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            pass
+    return "pickle", pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _decode_frame(encoded: Optional[Tuple[str, bytes]]) -> Optional[pd.DataFrame]:
+    if encoded is None:
+        return None
+    kind, data = encoded
+    if kind == "arrow":
+        return pa.ipc.open_stream(data).read_all().to_pandas()
+    return pickle.loads(data)
+
+
+def _run_shard(shard: Tuple[str, List[dict], str]) -> Optional[Tuple[str, bytes]]:
+    """子进程入口：处理单个分片并返回编码后的结果"""
+    return _encode_frame(transform_units(*shard))
+
+
+class ShardedExecutor:
+    """
+    按 项目×赛区 分片处理赛程数据
+
+    workers大于1时使用进程池并行处理各分片，绕开GIL；分片应先经 partition_units
+    按赛区拆分和精简，子进程以Arrow列式数据返回结果，减少进程间传输和反序列化的开销。
+    """
+
+    def __init__(self, workers: int = 1):
+        self.workers = max(1, workers)
+
+    def run(self, shards: List[Tuple[str, List[dict], str]]) -> List[pd.DataFrame]:
+        """
+        处理所有分片
+        Args:
+            shards: 分片列表，每个分片为 (项目名称, 赛程单元列表, 赛区)
+        Returns:
+            各分片的结果（保持分片顺序，跳过没有赛程的分片）
+        """
+        if self.workers == 1 or len(shards) <= 1:
+            results = [transform_units(*shard) for shard in shards]
+        else:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(shards))) as executor:
+                results = [_decode_frame(encoded) for encoded in executor.map(_run_shard, shards)]
+
+        return [df for df in results if df is not None]
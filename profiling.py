@@ -0,0 +1,223 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+PROFILE_MODES = ("cprofile", "sample")
+
+
+def _frame_label(code) -> str:
+    """折叠栈中函数的显示名称"""
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _StackSampler:
+    """在后台线程中定时采样所有线程的调用栈，每个栈以线程名称作为首帧"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self._thread.ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                if stack:
+                    thread_name = names.get(thread_id, str(thread_id))
+                    self.samples[(f"[{thread_name}]",) + tuple(reversed(stack))] += 1
+
+    def start(self) -> "_StackSampler":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+class _ThreadProfiles:
+    """
+    为阶段内新启动的线程（如上传飞书的线程池）各自启用cProfile
+
+    Python 3.12起cProfile基于sys.monitoring，主线程的Profile已经覆盖所有线程，不需要额外处理
+    """
+
+    def __init__(self):
+        self.profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def _start_profile(self, frame, event, arg):
+        # 线程启动后的第一次调用事件，启用后cProfile会替换掉这个钩子
+        profile = cProfile.Profile()
+        with self._lock:
+            self.profiles.append(profile)
+        profile.enable()
+
+    def start(self) -> "_ThreadProfiles":
+        if sys.version_info < (3, 12):
+            threading.setprofile(self._start_profile)
+        return self
+
+    def stop(self):
+        if sys.version_info < (3, 12):
+            threading.setprofile(None)
+
+
+class Profiler:
+    """
+    按阶段分析流水线性能
+
+    mode为"cprofile"时每个阶段使用cProfile，输出统计报告和.prof文件；
+    mode为"sample"时在后台线程采样所有线程的调用栈。两种模式都包含阶段内启动的线程（如飞书上传线程池），
+    都会输出flamegraph.pl / speedscope 可直接读取的折叠栈文件（cProfile只能还原调用方→被调用方两层）。
+    track_memory为True时用tracemalloc记录每个阶段的内存分配。
+    只分析主进程，多进程处理时子进程中的开销不会被统计。
+    """
+
+    def __init__(self, mode: Optional[str] = None, track_memory: bool = False,
+                 output_dir: str = "profile", interval: float = 0.005):
+        """
+        Args:
+            mode: "cprofile"、"sample" 或 None（不做CPU分析）
+            track_memory: 是否记录内存分配
+            output_dir: 报告输出目录
+            interval: 采样间隔（秒），仅sample模式使用
+        """
+        if mode is not None and mode not in PROFILE_MODES:
+            raise ValueError(f"不支持的分析模式: {mode}")
+        self.mode = mode
+        self.track_memory = track_memory
+        self.output_dir = output_dir
+        self.interval = interval
+        # 各阶段耗时 (阶段名, 秒)
+        self.timings: List[Tuple[str, float]] = []
+        # 所有阶段的折叠栈，首帧为阶段名
+        self.collapsed: Counter = Counter()
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode is not None or self.track_memory
+
+    def _path(self, stage: str, suffix: str) -> str:
+        return os.path.join(self.output_dir, f"{len(self.timings):02d}_{stage}{suffix}")
+
+    @contextmanager
+    def stage(self, name: str):
+        """分析一个阶段，未启用分析时不做任何事"""
+        if not self.enabled:
+            yield
+            return
+
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        if self.track_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(25)
+            tracemalloc.reset_peak()
+            memory_before = tracemalloc.take_snapshot()
+
+        profile = thread_profiles = sampler = None
+        if self.mode == "cprofile":
+            thread_profiles = _ThreadProfiles().start()
+            profile = cProfile.Profile()
+            profile.enable()
+        elif self.mode == "sample":
+            sampler = _StackSampler(self.interval).start()
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+
+            if profile is not None:
+                profile.disable()
+                thread_profiles.stop()
+                self._write_cprofile(name, [profile] + thread_profiles.profiles)
+            if sampler is not None:
+                sampler.stop()
+                self._write_samples(name, sampler.samples)
+            if self.track_memory:
+                self._write_memory(name, memory_before)
+
+            self.timings.append((name, elapsed))
+            print(f"[profile] {name}: {elapsed:.3f}s")
+
+    def _write_cprofile(self, stage: str, profiles: List[cProfile.Profile]):
+        """合并主线程和各线程的cProfile结果并输出"""
+        stream = io.StringIO()
+        stats = pstats.Stats(*profiles, stream=stream)
+        stats.dump_stats(self._path(stage, ".prof"))
+
+        stats.sort_stats("cumulative").print_stats(50)
+        stats.sort_stats("tottime").print_stats(30)
+        with open(self._path(stage, ".cprofile.txt"), 'w', encoding='utf-8') as f:
+            f.write(stream.getvalue())
+
+        # 由调用关系还原两层折叠栈，权重为自身耗时（微秒）
+        stacks: Counter = Counter()
+        for (filename, lineno, funcname), (_, _, tottime, _, callers) in stats.stats.items():
+            callee = f"{funcname} ({os.path.basename(filename)}:{lineno})"
+            if not callers:
+                stacks[(stage, callee)] += int(tottime * 1e6)
+                continue
+            for (c_filename, c_lineno, c_funcname), caller_stats in callers.items():
+                caller = f"{c_funcname} ({os.path.basename(c_filename)}:{c_lineno})"
+                stacks[(stage, caller, callee)] += int(caller_stats[2] * 1e6)
+        self._add_collapsed(stage, stacks)
+
+    def _write_samples(self, stage: str, samples: Counter):
+        stacks = Counter({(stage,) + stack: count for stack, count in samples.items()})
+        self._add_collapsed(stage, stacks)
+
+    def _add_collapsed(self, stage: str, stacks: Counter):
+        stacks = Counter({stack: weight for stack, weight in stacks.items() if weight > 0})
+        self.collapsed.update(stacks)
+        self._write_collapsed(self._path(stage, ".collapsed"), stacks)
+
+    @staticmethod
+    def _write_collapsed(path: str, stacks: Counter):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, weight in stacks.most_common():
+                f.write(f"{';'.join(stack)} {weight}\n")
+
+    def _write_memory(self, stage: str, memory_before):
+        memory_after = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        with open(self._path(stage, ".memory.txt"), 'w', encoding='utf-8') as f:
+            f.write(f"当前: {current / 1024 / 1024:.2f} MiB, 峰值: {peak / 1024 / 1024:.2f} MiB\n\n")
+            f.write("分配增量最多的代码行:\n")
+            for stat in memory_after.compare_to(memory_before, "lineno")[:30]:
+                f.write(f"{stat}\n")
+
+    def write_summary(self) -> Optional[str]:
+        """输出各阶段耗时汇总和合并的折叠栈文件，返回汇总文件路径"""
+        if not self.enabled or not self.timings:
+            return None
+
+        if self.collapsed:
+            self._write_collapsed(os.path.join(self.output_dir, "all.collapsed"), self.collapsed)
+
+        total = sum(elapsed for _, elapsed in self.timings)
+        summary_path = os.path.join(self.output_dir, "summary.txt")
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            for name, elapsed in self.timings:
+                f.write(f"{name:<12}{elapsed:>10.3f}s{elapsed / total * 100 if total else 0:>8.1f}%\n")
+            f.write(f"{'total':<12}{total:>10.3f}s\n")
+        print(f"性能分析报告已保存到 {self.output_dir}")
+        return summary_path
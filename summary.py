@@ -0,0 +1,201 @@
+import json
+import math
+import os
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+# 汇总所依赖的赛程列
+SUMMARY_SOURCE_COLUMNS = ['项目名称', '比赛日期', '场馆名称', '开始时间', '产生奖牌数']
+
+# 场馆汇总表的列
+SUMMARY_COLUMNS = ['比赛日期', '场馆名称', '赛程单元数', '项目', '首场开始时间', '末场开始时间', '奖牌赛单元数']
+
+
+def _is_medal(value) -> bool:
+    """产生奖牌数是否表示该单元为奖牌赛"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return False
+    try:
+        return float(value) > 0
+    except (TypeError, ValueError):
+        return str(value).strip().lower() not in ("", "0", "false", "否", "none")
+
+
+def _format_time(value) -> Optional[str]:
+    if value is None or pd.isna(value):
+        return None
+    return str(value)
+
+
+class ScheduleSummary:
+    """
+    按 比赛日期×场馆 预先汇总的赛程
+
+    每次获取数据后调用 update，只有赛程单元发生变化的分组会被重新计算；
+    get / day 查询直接返回预先计算好的结果。
+    """
+
+    def __init__(self):
+        # (日期, 场馆) -> {行摘要: 行信息}，行信息中count为相同行的数量
+        self._rows: Dict[Tuple[str, str], Dict[str, dict]] = {}
+        # (日期, 场馆) -> 场馆汇总
+        self._groups: Dict[Tuple[str, str], dict] = {}
+        # 日期 -> {场馆: 场馆汇总}
+        self._days: Dict[str, Dict[str, dict]] = {}
+        # 日期 -> 当天汇总
+        self._day_totals: Dict[str, dict] = {}
+
+    @staticmethod
+    def _extract_rows(df: pd.DataFrame) -> Dict[Tuple[str, str], Dict[str, dict]]:
+        """按 (日期, 场馆) 分组提取汇总所需的行信息"""
+        if df.empty or not {'比赛日期', '场馆名称'}.issubset(df.columns):
+            return {}
+
+        columns = [col for col in SUMMARY_SOURCE_COLUMNS if col in df.columns]
+        source = df[columns]
+        hashes = pd.util.hash_pandas_object(source, index=False)
+
+        disciplines = source['项目名称'] if '项目名称' in source else [None] * len(source)
+        starts = source['开始时间'] if '开始时间' in source else [None] * len(source)
+        medals = source['产生奖牌数'] if '产生奖牌数' in source else [None] * len(source)
+
+        rows: Dict[Tuple[str, str], Dict[str, dict]] = {}
+        for row_hash, date, venue, discipline, start, medal in zip(
+                hashes, source['比赛日期'], source['场馆名称'], disciplines, starts, medals):
+            group = rows.setdefault((str(date), str(venue)), {})
+            key = str(row_hash)
+            if key in group:
+                group[key]["count"] += 1
+            else:
+                group[key] = {
+                    "count": 1,
+                    "discipline": discipline,
+                    "start": _format_time(start),
+                    "medal": _is_medal(medal)
+                }
+        return rows
+
+    def update(self, df: pd.DataFrame, dates: List[str] = None) -> List[Tuple[str, str]]:
+        """
+        用最新的赛程数据更新汇总
+        Args:
+            df: 赛程数据（中文列名）
+            dates: df只包含这些日期的数据时传入，其他日期的汇总保持不变；None表示df为全部赛程
+        Returns:
+            重新计算过的 (日期, 场馆) 分组
+        """
+        rows = self._extract_rows(df)
+
+        if dates is None:
+            scope = set(self._rows) | set(rows)
+        else:
+            dates = {str(date) for date in dates}
+            rows = {group: group_rows for group, group_rows in rows.items() if group[0] in dates}
+            scope = {group for group in self._rows if group[0] in dates} | set(rows)
+
+        changed = []
+        for group in scope:
+            new_rows = rows.get(group, {})
+            if self._rows.get(group, {}) == new_rows:
+                continue
+            changed.append(group)
+            if new_rows:
+                self._rows[group] = new_rows
+            else:
+                self._rows.pop(group, None)
+
+        for group in changed:
+            self._recompute_group(group)
+        for date in {date for date, _ in changed}:
+            self._recompute_day(date)
+
+        return sorted(changed)
+
+    def _recompute_group(self, group: Tuple[str, str]):
+        date, venue = group
+        rows = self._rows.get(group)
+        if not rows:
+            self._groups.pop(group, None)
+            self._days.get(date, {}).pop(venue, None)
+            return
+
+        starts = sorted(row["start"] for row in rows.values() if row["start"])
+        disciplines = sorted({str(row["discipline"]) for row in rows.values() if row["discipline"] is not None})
+        summary = {
+            '比赛日期': date,
+            '场馆名称': venue,
+            '赛程单元数': sum(row["count"] for row in rows.values()),
+            '项目': '、'.join(disciplines),
+            '首场开始时间': starts[0] if starts else '',
+            '末场开始时间': starts[-1] if starts else '',
+            '奖牌赛单元数': sum(row["count"] for row in rows.values() if row["medal"])
+        }
+        self._groups[group] = summary
+        self._days.setdefault(date, {})[venue] = summary
+
+    def _recompute_day(self, date: str):
+        venues = self._days.get(date)
+        if not venues:
+            self._days.pop(date, None)
+            self._day_totals.pop(date, None)
+            return
+
+        self._day_totals[date] = {
+            '比赛日期': date,
+            '场馆数': len(venues),
+            '赛程单元数': sum(summary['赛程单元数'] for summary in venues.values()),
+            '奖牌赛单元数': sum(summary['奖牌赛单元数'] for summary in venues.values())
+        }
+
+    def get(self, date, venue: str) -> Optional[dict]:
+        """某一天某个场馆的汇总"""
+        return self._groups.get((str(date), venue))
+
+    def venues_on(self, date) -> Dict[str, dict]:
+        """某一天各场馆的汇总，场馆名称 -> 汇总"""
+        return self._days.get(str(date), {})
+
+    def day(self, date) -> Optional[dict]:
+        """某一天的总体汇总（场馆数、赛程单元数、奖牌赛单元数）"""
+        return self._day_totals.get(str(date))
+
+    def to_frame(self, date=None) -> pd.DataFrame:
+        """
+        汇总表
+        Args:
+            date: 指定时只返回这一天的汇总
+        """
+        if date is None:
+            records = [self._groups[group] for group in sorted(self._groups)]
+        else:
+            venues = self.venues_on(date)
+            records = [venues[venue] for venue in sorted(venues)]
+        return pd.DataFrame(records, columns=SUMMARY_COLUMNS)
+
+    def save(self, path: str = ".cache/summary.json"):
+        """保存汇总的行信息，下次运行时据此增量更新"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        data = [[date, venue, rows] for (date, venue), rows in self._rows.items()]
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = ".cache/summary.json") -> "ScheduleSummary":
+        """读取上次保存的汇总，不存在时返回空汇总"""
+        summary = cls()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return summary
+
+        for date, venue, rows in data:
+            summary._rows[(date, venue)] = rows
+        for group in summary._rows:
+            summary._recompute_group(group)
+        for date in summary._days:
+            summary._recompute_day(date)
+        return summary